@@ -5,6 +5,7 @@
 """Library for the Adafruit PyCamera with OV5640 autofocus module"""
 
 import gc
+import math
 import os
 import struct
 import time
@@ -34,12 +35,23 @@ from adafruit_display_text import label
 from digitalio import DigitalInOut, Pull
 from rainbowio import colorwheel
 
+from adafruit_pycamera.capture_stats import CaptureStats
+from adafruit_pycamera.register_sequence import compile_register_list
+
 __version__ = "0.0.0-auto.0"
 __repo__ = "https://github.com/adafruit/Adafruit_CircuitPython_PyCamera.git"
 
 from micropython import const
 
 _REG_DLY = const(0xFFFF)
+_I2C_BURST_SIZE = const(1024)
+
+_OV5640_REG_SYSTEM_RESET00 = const(0x3000)
+_OV5640_MCU_RESET = const(0x20)
+_OV5640_FIRMWARE_ADDR = const(0x8000)
+_OV5640_REG_TIMING_X_ADDR_ST = const(0x3800)  # through 0x3815: window, size, offset, inc
+_OV5640_REG_ISP_CONTROL01 = const(0x5001)
+_OV5640_SCALE_ENABLE = const(0x20)
 
 _OV5640_STAT_FIRMWAREBAD = const(0x7F)
 _OV5640_STAT_STARTUP = const(0x7E)
@@ -77,6 +89,12 @@ _NVM_EFFECT = const(2)
 _NVM_MODE = const(3)
 _NVM_TIMELAPSE_RATE = const(4)
 _NVM_TIMELAPSE_SUBMODE = const(5)
+_NVM_FOCUS_PRESETS = const(6)  # 2 bytes (valid marker, VCM step) per preset
+
+_IMAGE_INDEX_FILE = "/sd/.pycamera_next_image"
+
+_FOCUS_PRESET_COUNT = const(8)
+_FOCUS_PRESET_VALID = const(0xA5)
 
 
 class PyCameraBase:
@@ -85,28 +103,85 @@ class PyCameraBase:
     Wrapper class for the PyCamera hardware with lots of smarts
     """
 
-    _finalize_firmware_load = (
-        0x3022,
-        0x00,
-        0x3023,
-        0x00,
-        0x3024,
-        0x00,
-        0x3025,
-        0x00,
-        0x3026,
-        0x00,
-        0x3027,
-        0x00,
-        0x3028,
-        0x00,
-        0x3029,
-        0x7F,
-        0x3000,
-        0x00,
+    _finalize_firmware_load = compile_register_list(
+        (
+            0x3022,
+            0x00,
+            0x3023,
+            0x00,
+            0x3024,
+            0x00,
+            0x3025,
+            0x00,
+            0x3026,
+            0x00,
+            0x3027,
+            0x00,
+            0x3028,
+            0x00,
+            0x3029,
+            0x7F,
+            0x3000,
+            0x00,
+        )
     )
     led_levels = [0.0, 0.1, 0.2, 0.5, 1.0]
 
+    focus_preset_names = ()
+    """Optional names for the focus preset slots, so that e.g. ``"bench"``
+    can be passed to `save_focus_preset` instead of the slot number"""
+
+    i2c_profiled_methods = (
+        "autofocus",
+        "contrast_autofocus",
+        "keys_debounce",
+        "get_camera_autosettings",
+        "set_camera_wb",
+        "set_camera_exposure",
+        "set_camera_gain",
+        "capture_jpeg",
+        "live_preview_mode",
+    )
+    """Methods whose I2C traffic is reported under their own name by `start_i2c_profiling`"""
+
+    preview_profiles = {
+        "standard": (espcamera.PixelFormat.RGB565, espcamera.FrameSize.HQVGA, None),
+        "fast": (espcamera.PixelFormat.RGB565, espcamera.FrameSize.QQVGA, None),
+        "grayscale": (espcamera.PixelFormat.GRAYSCALE, espcamera.FrameSize.HQVGA, None),
+        "fast_grayscale": (espcamera.PixelFormat.GRAYSCALE, espcamera.FrameSize.QQVGA, None),
+    }
+    """Live preview settings selectable with `preview_profile`, as tuples of
+    (pixel format, frame size, downsize/DCW setting). A DCW of None leaves the
+    sensor's setting alone. Grayscale frames are meant for analysis such as QR
+    decoding; they cannot be shown with `blit` directly."""
+
+    status_bars = ("top", "bottom", "timelapse")
+    """Names of the status bars, for `mark_status_bar_dirty`"""
+
+    save_chunk_size = 16384
+    """Bytes per write when saving an image, rounded down to a whole number of
+    SD card clusters (but at least one). 0 writes each image in a single call."""
+
+    save_queue_budget = 2_000_000
+    """Most bytes `queue_save` holds in RAM before it waits for earlier images to be written"""
+
+    camera_settle_timeout = 0.1
+    """Longest time, in seconds, to wait for the first frame after the camera is reconfigured"""
+
+    autofocus_status_max_age = 0.1
+    """How long, in seconds, `autofocus_focused` may reuse the last status read"""
+
+    autofocus_lock_timeout = 1.0
+    """How long, in seconds, `autofocus_if_needed` waits for continuous autofocus
+    to lock before it falls back to a single `autofocus` operation"""
+
+    volatile_registers = (
+        (0x3022, 0x3029),  # autofocus command, ack, parameters & status
+        (0x3400, 0x350B),  # AWB gains, AEC exposure & AGC gain results
+    )
+    """Inclusive ranges of camera registers that the sensor changes on its own.
+    These are always read over I2C, even when the register cache is enabled."""
+
     colors = [
         0xFFFFFF,
         0xFF0000,
@@ -220,9 +295,23 @@ class PyCameraBase:
         self.timelapsestatus_label = None
         self.timelapse_submode_label = None
         self._camera_device = None
+        self._camera_pixel_format = None
+        self._camera_frame_size = None
+        self._burst_buf = bytearray(2 + _I2C_BURST_SIZE)
+        self._register_cache = None
+        self.register_cache_hits = 0
+        self.register_cache_misses = 0
+        self._autofocus_continuous = False
+        self.i2c_profiler = None
+        self._autofocus_status_value = None
+        self._autofocus_status_time = None
         self._display_bus = None
         self._effect_label = None
-        self._image_counter = 0
+        self._image_counter = None
+        self._image_index_dirty = False
+        self._save_queue = []
+        self._save_queue_bytes = 0
+        self._sd_cluster_size = None
         self._mode_label = None
         self._res_label = None
         self._sd_label = None
@@ -238,9 +327,42 @@ class PyCameraBase:
         self.overlay_transparency_color = None
         self.overlay_bmp = None
         self.combined_bmp = None
+        self._overlay_preview_bmp = None
+        self._dirty_status_bars = set()
+        self._batch_depth = 0
+        self.deferred_refresh = False
+        """If True, status bar changes are drawn just before the next `blit`
+        instead of immediately"""
+        self._message_label = None
+        self._overlay_preview_key = None
+        self._overlay_preview_box = None
         self.preview_scale = None
         self.overlay_position = [None, None]
         self.overlay_scale = 1.0
+        self._preview_profile = "standard"
+        self._preview_pixel_format = espcamera.PixelFormat.RGB565
+        self._preview_frame_size = espcamera.FrameSize.HQVGA
+        self._preview_dcw = None
+        self._zoom = 1.0
+        self._zoom_center = (0.5, 0.5)
+        self._zoom_window = None
+        self._history_slots = None
+        self._history_lengths = None
+        self._history_times = None
+        self._history_next = 0
+        self._history_count = 0
+        self.shutter_fell_time = None
+        """The `time.monotonic_ns` value when `keys_debounce` last saw the
+        shutter button pressed"""
+        self.capture_stats = {
+            "capture_jpeg": CaptureStats(),
+            "capture_into_jpeg": CaptureStats(),
+            "blit_overlay_into_last_capture": CaptureStats(),
+        }
+        """Map of capture method name to the
+        `adafruit_pycamera.capture_stats.CaptureStats` of its phases"""
+        self._last_capture_stats = None
+        self.preview_stats = None
         self.splash = displayio.Group()
 
         # Reset display and I/O expander
@@ -286,6 +408,50 @@ class PyCameraBase:
 
         self.check_for_update_needed()
 
+    def start_i2c_profiling(self):
+        """Start counting I2C transactions, bytes and time
+
+        The camera, I/O expander and accelerometer devices are replaced by
+        instrumented stand-ins, and traffic is grouped by the outermost of
+        `i2c_profiled_methods` that caused it (or ``"other"``). Register
+        accesses made internally by ``espcamera`` are not seen.
+
+        Returns the `adafruit_pycamera.i2cprofiler.I2CProfiler`, which is also
+        available as `i2c_profiler` until `stop_i2c_profiling` is called. When
+        profiling is stopped, there is no overhead."""
+        from adafruit_pycamera.i2cprofiler import I2CProfiler, ProfiledI2CDevice
+
+        if self.i2c_profiler is not None:
+            return self.i2c_profiler
+        profiler = I2CProfiler()
+        if self._camera_device is not None:
+            self._camera_device = ProfiledI2CDevice(self._camera_device, profiler)
+        self._aw.i2c_device = ProfiledI2CDevice(self._aw.i2c_device, profiler)
+        if self.accel is not None:
+            self.accel._i2c = ProfiledI2CDevice(self.accel._i2c, profiler)
+        for name in self.i2c_profiled_methods:
+            setattr(self, name, profiler.wrap(name, getattr(self, name)))
+        self.i2c_profiler = profiler
+        return profiler
+
+    def stop_i2c_profiling(self):
+        """Stop profiling I2C traffic and restore the original devices
+
+        Returns the `adafruit_pycamera.i2cprofiler.I2CProfiler` so that its
+        results can still be inspected, or None if profiling was not active."""
+        profiler = self.i2c_profiler
+        if profiler is None:
+            return None
+        for name in self.i2c_profiled_methods:
+            delattr(self, name)
+        if self.accel is not None:
+            self.accel._i2c = self.accel._i2c.device
+        self._aw.i2c_device = self._aw.i2c_device.device
+        if self._camera_device is not None:
+            self._camera_device = self._camera_device.device
+        self.i2c_profiler = None
+        return profiler
+
     def check_for_update_needed(self):
         """Check whether CIRCUITPY is too big, indicating it was created
         by a version of CircuitPython older than 9.0.0 beta 2.
@@ -346,6 +512,56 @@ See Learn Guide."""
         self.splash.append(self._botbar)
         self.splash.append(self._timelapsebar)
 
+    def mark_status_bar_dirty(self, *bars):
+        """Note that labels in the given status bars (names from
+        `status_bars`) have changed and need to be refreshed"""
+        self._dirty_status_bars.update(bars)
+
+    def _update_label(self, bar, text_label, **properties):
+        # Set only the label properties that differ, so that re-applying the
+        # current settings does not lead to a display refresh
+        for name, value in properties.items():
+            if getattr(text_label, name) != value:
+                setattr(text_label, name, value)
+                self._dirty_status_bars.add(bar)
+
+    def refresh_status_bars(self) -> bool:
+        """Refresh the display if any status bar has changed
+
+        Bars are only marked dirty when one of their labels' text or colors
+        actually changed, and nothing at all is done when no bar is dirty, so
+        the live preview band written by `blit` is left alone. displayio
+        itself limits the refresh to the changed label areas; it does not
+        report how many pixels that sends. Returns True if the display was
+        refreshed.
+
+        Inside `batch_updates`, or when `deferred_refresh` is set, the refresh
+        is postponed and False is returned."""
+        if self._batch_depth or self.deferred_refresh:
+            return False
+        return self._flush_status_bars()
+
+    def batch_updates(self):
+        """Return a context manager that postpones display refreshes
+
+        Settings changed inside the ``with`` block (``effect``, ``resolution``,
+        ``mode``, ``timelapse_rate``, `select_setting`, SD card mounting, ...)
+        are drawn with a single refresh when the outermost block ends::
+
+            with pycam.batch_updates():
+                pycam.effect = 2
+                pycam.resolution = "640x480"
+                pycam.mode = 0
+        """
+        return _BatchUpdates(self)
+
+    def _flush_status_bars(self):
+        if not self._dirty_status_bars or self.display is None:
+            return False
+        self._dirty_status_bars.clear()
+        self.display.refresh()
+        return True
+
     def init_accelerometer(self):
         """Initialize the accelerometer"""
         # lis3dh accelerometer
@@ -389,6 +605,10 @@ See Learn Guide."""
         )
 
         self._camera_device = I2CDevice(self._i2c, self.camera.address)
+        self._camera_pixel_format = espcamera.PixelFormat.RGB565
+        self._camera_frame_size = espcamera.FrameSize.HQVGA
+        self._zoom_window = None
+        self.invalidate_register_cache()
 
         self.camera.hmirror = False
         self.camera.vflip = True
@@ -397,23 +617,230 @@ See Learn Guide."""
         self.led_level = 0
 
         # self.camera.colorbar = True
-        self.effect = microcontroller.nvm[_NVM_EFFECT]
-        self.camera.saturation = 3
-        self.resolution = microcontroller.nvm[_NVM_RESOLUTION]
-        self.mode = microcontroller.nvm[_NVM_MODE]
-        self.timelapse_rate = microcontroller.nvm[_NVM_TIMELAPSE_RATE]
-        self.timelapse_submode = microcontroller.nvm[_NVM_TIMELAPSE_SUBMODE]
+        with self.batch_updates():
+            self.effect = microcontroller.nvm[_NVM_EFFECT]
+            self.camera.saturation = 3
+            self.resolution = microcontroller.nvm[_NVM_RESOLUTION]
+            self.mode = microcontroller.nvm[_NVM_MODE]
+            self.timelapse_rate = microcontroller.nvm[_NVM_TIMELAPSE_RATE]
+            self.timelapse_submode = microcontroller.nvm[_NVM_TIMELAPSE_SUBMODE]
 
         if init_autofocus:
             self.autofocus_init()
 
         print("init done @", time.monotonic() - self._timestamp)
 
-    def autofocus_init_from_file(self, filename):
-        """Initialize the autofocus engine from a .bin file"""
+    def autofocus_init_from_file(self, filename, force=False, verify=False):
+        """Initialize the autofocus engine from a .bin file
+
+        See `autofocus_init_from_bitstream` for the meaning of ``force`` and
+        ``verify``. When neither is set and the firmware is already running,
+        the file is not even read."""
+        self._check_autofocus_supported()
+        if not (force or verify) and self.autofocus_firmware_running:
+            return False
         with open(filename, mode="rb") as file:
             firmware = file.read()
-        self.autofocus_init_from_bitstream(firmware)
+        return self.autofocus_init_from_bitstream(firmware, force=force, verify=verify)
+
+    @property
+    def register_cache(self) -> bool:
+        """Get or set whether camera register reads may be answered from RAM
+
+        When enabled, every value written with `write_camera_register` or
+        `write_camera_list` (and every value read back over I2C) is remembered,
+        and later reads of the same register return the remembered value.
+        Registers in `volatile_registers` are always read over I2C.
+
+        `register_cache_hits` and `register_cache_misses` count the reads that
+        could use the cache: reads of volatile registers are not counted, and
+        a `read_camera_registers` burst counts as a single hit or miss, not
+        one per register. Enabling the cache resets both counters."""
+        return self._register_cache is not None
+
+    @register_cache.setter
+    def register_cache(self, enabled: bool) -> None:
+        if not enabled:
+            self._register_cache = None
+        elif self._register_cache is None:
+            self._register_cache = {}
+            self.register_cache_hits = 0
+            self.register_cache_misses = 0
+
+    def invalidate_register_cache(self) -> None:
+        """Forget all remembered camera register values
+
+        This is done automatically when the camera is reset or reconfigured
+        through this class. Call it after changing sensor settings directly
+        through ``self.camera``."""
+        if self._register_cache is not None:
+            self._register_cache.clear()
+
+    def _register_is_volatile(self, reg: int) -> bool:
+        for first, last in self.volatile_registers:
+            if first <= reg <= last:
+                return True
+        return False
+
+    def reconfigure_camera(self, pixel_format, frame_size) -> bool:
+        """Change the camera's pixel format and frame size
+
+        Nothing is done if the camera is already in the requested mode.
+        Returns True if the camera was actually reconfigured.
+
+        Use this instead of calling ``camera.reconfigure`` directly, so that
+        the current mode stays known."""
+        if pixel_format == self._camera_pixel_format and frame_size == self._camera_frame_size:
+            return False
+        self.camera.reconfigure(pixel_format=pixel_format, frame_size=frame_size)
+        self._camera_pixel_format = pixel_format
+        self._camera_frame_size = frame_size
+        self.invalidate_register_cache()
+        self._zoom_window = None
+        if self._zoom != 1.0 or self._zoom_center != (0.5, 0.5):
+            self._apply_zoom()
+        return True
+
+    @property
+    def zoom(self) -> float:
+        """Get or set the digital zoom factor, 1.0 for the full field of view
+
+        Zoom is done by the sensor: it reads out only the selected region and
+        its ISP scales that to the current frame size, so preview frames and
+        saved images show the same region and the CPU never handles the
+        cropped pixels. The change takes effect at a frame boundary.
+
+        The sensor cannot enlarge an image, so the zoom actually applied is
+        limited to `zoom_limit`, which is smaller at high resolutions."""
+        return self._zoom
+
+    @zoom.setter
+    def zoom(self, zoom: float) -> None:
+        if zoom < 1:
+            raise RuntimeError("Zoom must be at least 1")
+        self._zoom = zoom
+        self._apply_zoom()
+
+    @property
+    def zoom_center(self):
+        """Get or set the center of the zoomed region, as ``(x, y)`` fractions of the image"""
+        return self._zoom_center
+
+    @zoom_center.setter
+    def zoom_center(self, center) -> None:
+        x, y = center
+        if not (0 <= x <= 1 and 0 <= y <= 1):
+            raise RuntimeError("Zoom center must be 0 to 1")
+        self._zoom_center = (x, y)
+        self._apply_zoom()
+
+    @property
+    def zoom_limit(self) -> float:
+        """The largest zoom the sensor can apply at the current frame size"""
+        return self._read_zoom_window()[-1]
+
+    def _read_zoom_window(self):
+        """Read the sensor window chosen by espcamera for the current mode"""
+        if self._zoom_window is None:
+            regs = self.read_camera_registers(_OV5640_REG_TIMING_X_ADDR_ST, 0x16)
+            x_start = (regs[0] << 8) | regs[1]
+            y_start = (regs[2] << 8) | regs[3]
+            width = ((regs[4] << 8) | regs[5]) - x_start + 1
+            height = ((regs[6] << 8) | regs[7]) - y_start + 1
+            out_width = (regs[8] << 8) | regs[9]
+            out_height = (regs[10] << 8) | regs[11]
+            x_offset = (regs[16] << 8) | regs[17]
+            y_offset = (regs[18] << 8) | regs[19]
+            # odd + even increments; 0x11 means no subsampling, 0x31 means 2:1
+            x_sub = ((regs[20] >> 4) + (regs[20] & 0xF)) / 2
+            y_sub = ((regs[21] >> 4) + (regs[21] & 0xF)) / 2
+            # The ISP scaler input is window / sub - 2 * offset, and it must be
+            # at least the output size; the offset does not shrink with the window
+            min_width = math.ceil((out_width + 2 * x_offset) * x_sub)
+            min_height = math.ceil((out_height + 2 * y_offset) * y_sub)
+            min_width = min(width, min_width + (min_width & 1))
+            min_height = min(height, min_height + (min_height & 1))
+            limit = max(1.0, min(width / min_width, height / min_height))
+            self._zoom_window = (x_start, y_start, width, height, min_width, min_height, limit)
+        return self._zoom_window
+
+    def _apply_zoom(self):
+        if self.camera is None:
+            return
+        x_start, y_start, width, height, min_width, min_height, limit = self._read_zoom_window()
+        zoom = min(self._zoom, limit)
+        zoom_width = min(width, max(min_width, int(width / zoom) & ~1))
+        zoom_height = min(height, max(min_height, int(height / zoom) & ~1))
+        center_x, center_y = self._zoom_center
+        if self.camera.hmirror:
+            center_x = 1 - center_x
+        if self.camera.vflip:
+            center_y = 1 - center_y
+        x = x_start + min(max(0, int(center_x * width - zoom_width / 2)), width - zoom_width)
+        y = y_start + min(max(0, int(center_y * height - zoom_height / 2)), height - zoom_height)
+        x_end = x + zoom_width - 1
+        y_end = y + zoom_height - 1
+        isp_control = self.read_camera_register(_OV5640_REG_ISP_CONTROL01)
+        if zoom > 1:
+            isp_control |= _OV5640_SCALE_ENABLE
+        # group hold, so that the whole window changes between two frames
+        self.write_camera_list(
+            (
+                0x3212,
+                0x03,
+                _OV5640_REG_TIMING_X_ADDR_ST,
+                x >> 8,
+                _OV5640_REG_TIMING_X_ADDR_ST + 1,
+                x & 0xFF,
+                _OV5640_REG_TIMING_X_ADDR_ST + 2,
+                y >> 8,
+                _OV5640_REG_TIMING_X_ADDR_ST + 3,
+                y & 0xFF,
+                _OV5640_REG_TIMING_X_ADDR_ST + 4,
+                x_end >> 8,
+                _OV5640_REG_TIMING_X_ADDR_ST + 5,
+                x_end & 0xFF,
+                _OV5640_REG_TIMING_X_ADDR_ST + 6,
+                y_end >> 8,
+                _OV5640_REG_TIMING_X_ADDR_ST + 7,
+                y_end & 0xFF,
+                _OV5640_REG_ISP_CONTROL01,
+                isp_control,
+                0x3212,
+                0x13,
+                0x3212,
+                0xA3,
+            )
+        )
+
+    @property
+    def preview_profile(self):
+        """Get or set the name of the live preview profile from `preview_profiles`
+
+        The profile stays in effect across captures: `live_preview_mode`
+        always returns to it. Setting it switches the camera immediately."""
+        return self._preview_profile
+
+    @preview_profile.setter
+    def preview_profile(self, name):
+        if name not in self.preview_profiles:
+            raise RuntimeError("Invalid preview profile")
+        self._preview_profile = name
+        self._apply_preview_profile()
+        if self.camera is not None:
+            self.live_preview_mode()
+
+    def _apply_preview_profile(self):
+        pixel_format, frame_size, dcw = self.preview_profiles[self._preview_profile]
+        self._preview_pixel_format = pixel_format
+        self._preview_frame_size = frame_size
+        self._preview_dcw = dcw
+
+    def _wait_for_frame(self):
+        """Wait until the camera has a frame ready, or `camera_settle_timeout` passes"""
+        deadline = time.monotonic() + self.camera_settle_timeout
+        while not self.camera.frame_available and time.monotonic() < deadline:
+            pass
 
     def write_camera_register(self, reg: int, value: int) -> None:
         """Write a 1-byte camera register"""
@@ -423,66 +850,350 @@ See Learn Guide."""
         b[2] = value
         with self._camera_device as i2c:
             i2c.write(b)
-
-    def write_camera_list(self, reg_list: Sequence[int]) -> None:
-        """Write a series of 1-byte camera registers"""
-        for i in range(0, len(reg_list), 2):
-            register = reg_list[i]
-            value = reg_list[i + 1]
-            if register == _REG_DLY:
-                time.sleep(value / 1000)
-            else:
-                self.write_camera_register(register, value)
+        if self._register_cache is not None:
+            self._register_cache[reg] = value
+
+    def write_camera_list(self, reg_list: Sequence[int]) -> int:
+        """Write a series of 1-byte camera registers
+
+        The I2C bus is held for the whole list, and runs of consecutive
+        register addresses are merged into a single multi-byte write. A
+        ``_REG_DLY`` entry ends the current run and sleeps for its value in
+        milliseconds.
+
+        Returns the number of I2C transactions performed."""
+        buf = self._burst_buf
+        cache = self._register_cache
+        transactions = 0
+        end = 0
+        next_register = None
+        with self._camera_device as i2c:
+            for i in range(0, len(reg_list), 2):
+                register = reg_list[i]
+                value = reg_list[i + 1]
+                if register == _REG_DLY or register != next_register or end == len(buf):
+                    if end:
+                        i2c.write(buf, end=end)
+                        transactions += 1
+                        end = 0
+                    if register == _REG_DLY:
+                        time.sleep(value / 1000)
+                        next_register = None
+                        continue
+                    buf[0] = register >> 8
+                    buf[1] = register & 0xFF
+                    end = 2
+                buf[end] = value
+                end += 1
+                next_register = register + 1
+                if cache is not None:
+                    cache[register] = value
+            if end:
+                i2c.write(buf, end=end)
+                transactions += 1
+        return transactions
+
+    def write_camera_sequence(self, sequence: bytes) -> int:
+        """Write a register sequence compiled by
+        `adafruit_pycamera.register_sequence.compile_register_list`
+
+        The bus is held for the whole sequence and each frame is sent straight
+        from ``sequence``, so nothing is allocated per entry (unless
+        `register_cache` is enabled, in which case the cache is updated).
+
+        Returns the number of I2C transactions performed."""
+        cache = self._register_cache
+        transactions = 0
+        pos = 0
+        with self._camera_device as i2c:
+            while pos < len(sequence):
+                length = (sequence[pos] << 8) | sequence[pos + 1]
+                pos += 2
+                if length == 0:
+                    time.sleep(((sequence[pos] << 8) | sequence[pos + 1]) / 1000)
+                    pos += 2
+                    continue
+                if pos + length > len(sequence):
+                    raise ValueError("Truncated register sequence")
+                i2c.write(sequence, start=pos, end=pos + length)
+                transactions += 1
+                if cache is not None:
+                    register = (sequence[pos] << 8) | sequence[pos + 1]
+                    for i in range(pos + 2, pos + length):
+                        cache[register] = sequence[i]
+                        register += 1
+                pos += length
+        return transactions
+
+    def write_camera_sequence_from_file(self, filename) -> int:
+        """Write a compiled register sequence stored in a file
+
+        See `adafruit_pycamera.register_sequence` for the file format."""
+        from adafruit_pycamera.register_sequence import load_register_sequence
+
+        return self.write_camera_sequence(load_register_sequence(filename))
 
     def read_camera_register(self, reg: int) -> int:
-        """Read a 1-byte camera register"""
+        """Read a 1-byte camera register
+
+        If `register_cache` is enabled, the value may come from RAM instead."""
+        cache = self._register_cache
+        if cache is not None and not self._register_is_volatile(reg):
+            value = cache.get(reg)
+            if value is not None:
+                self.register_cache_hits += 1
+                return value
+            self.register_cache_misses += 1
+        else:
+            cache = None
         b_out = bytearray(2)
         b_out[0] = reg >> 8
         b_out[1] = reg & 0xFF
         b_in = bytearray(1)
         with self._camera_device as i2c:
             i2c.write_then_readinto(b_out, b_in)
+        if cache is not None:
+            cache[reg] = b_in[0]
         return b_in[0]
 
-    def autofocus_init_from_bitstream(self, firmware: bytes):
-        """Initialize the autofocus engine from a bytestring"""
-        if self.camera.sensor_name != "OV5640":
-            raise RuntimeError(f"Autofocus not supported on {self.camera.sensor_name}")
+    def read_camera_registers(self, start: int, count: int) -> bytearray:
+        """Read ``count`` consecutive 1-byte camera registers starting at ``start``
+
+        This uses the sensor's address auto-increment, so the whole range is
+        read in a single I2C transaction. If `register_cache` is enabled and
+        every register in the range is cached, no I2C transaction is made."""
+        cache = self._register_cache
+        # ranges with volatile registers are always read over I2C and not
+        # counted, like volatile registers in read_camera_register
+        if cache is not None and not any(
+            self._register_is_volatile(reg) for reg in range(start, start + count)
+        ):
+            for reg in range(start, start + count):
+                if reg not in cache:
+                    self.register_cache_misses += 1
+                    break
+            else:
+                self.register_cache_hits += 1
+                return bytearray(cache[reg] for reg in range(start, start + count))
+        b_out = bytearray(2)
+        b_out[0] = start >> 8
+        b_out[1] = start & 0xFF
+        b_in = bytearray(count)
+        with self._camera_device as i2c:
+            i2c.write_then_readinto(b_out, b_in)
+        if cache is not None:
+            for i, value in enumerate(b_in):
+                if not self._register_is_volatile(start + i):
+                    cache[start + i] = value
+        return b_in
 
-        self.write_camera_register(0x3000, 0x20)  # reset autofocus coprocessor
-        time.sleep(0.01)
+    @property
+    def autofocus_firmware_running(self) -> bool:
+        """True if the autofocus coprocessor is out of reset and reports a
+        healthy status, meaning firmware has already been loaded since the
+        sensor was last powered
+
+        `PyCamera` pulses the sensor's reset pin while probing the camera, so
+        on that hardware the coprocessor may come back in reset after every
+        ``PyCamera()`` and this is then False even across a code.py reload.
+        The check is only meaningful on an OV5640."""
+        if self.read_camera_register(_OV5640_REG_SYSTEM_RESET00) & _OV5640_MCU_RESET:
+            return False
+        return self.autofocus_status in {
+            _OV5640_STAT_IDLE,
+            _OV5640_STAT_FOCUSING,
+            _OV5640_STAT_FOCUSED,
+        }
 
-        arr = bytearray(256)
+    def _autofocus_firmware_matches(self, firmware: bytes) -> bool:
+        """Read back the coprocessor program memory and compare it to ``firmware``"""
+        b_out = bytearray(2)
+        buf = self._burst_buf
         with self._camera_device as i2c:
-            for offset in range(0, len(firmware), 254):
-                num_firmware_bytes = min(254, len(firmware) - offset)
-                reg = offset + 0x8000
-                arr[0] = reg >> 8
-                arr[1] = reg & 0xFF
-                arr[2 : 2 + num_firmware_bytes] = firmware[offset : offset + num_firmware_bytes]
-                i2c.write(arr, end=2 + num_firmware_bytes)
-
-        self.write_camera_list(self._finalize_firmware_load)
+            for offset in range(0, len(firmware), _I2C_BURST_SIZE):
+                num_firmware_bytes = min(_I2C_BURST_SIZE, len(firmware) - offset)
+                reg = offset + _OV5640_FIRMWARE_ADDR
+                b_out[0] = reg >> 8
+                b_out[1] = reg & 0xFF
+                i2c.write_then_readinto(b_out, buf, in_end=num_firmware_bytes)
+                if buf[:num_firmware_bytes] != firmware[offset : offset + num_firmware_bytes]:
+                    return False
+        return True
+
+    def autofocus_init_from_bitstream(self, firmware: bytes, force=False, verify=False):
+        """Initialize the autofocus engine from a bytestring
+
+        If the coprocessor is still running firmware loaded earlier (see
+        `autofocus_firmware_running`) the upload is skipped, unless ``force``
+        is True. With ``verify``, the program memory is also read back and
+        compared to ``firmware`` before deciding to skip. Whether the firmware
+        survives a code.py reload depends on whether the camera reset pulse
+        given by ``espcamera`` also resets the coprocessor; when it does, the
+        firmware is uploaded every time, as before.
+
+        Returns True if the firmware was uploaded, False if it was skipped."""
+        if not self._autofocus_firmware_needed(firmware, force, verify):
+            return False
+
+        # reset autofocus coprocessor
+        self.write_camera_register(_OV5640_REG_SYSTEM_RESET00, _OV5640_MCU_RESET)
+        time.sleep(0.01)
+
+        for offset in range(0, len(firmware), _I2C_BURST_SIZE):
+            self._write_autofocus_firmware_chunk(firmware, offset)
+
+        self.write_camera_sequence(self._finalize_firmware_load)
         for _ in range(100):
             if self.autofocus_status == _OV5640_STAT_IDLE:
                 break
             time.sleep(0.01)
         else:
             raise RuntimeError("Timed out after trying to load autofocus firmware")
+        return True
 
-    def autofocus_init(self):
-        """Initialize the autofocus engine from ov5640_autofocus.bin"""
-        if "/" in __file__:
-            binfile = __file__.rsplit("/", 1)[0].rsplit(".", 1)[0] + "/ov5640_autofocus.bin"
+    async def autofocus_init_from_bitstream_async(self, firmware: bytes, force=False, verify=False):
+        """Initialize the autofocus engine from a bytestring, yielding to other
+        tasks between firmware chunks and while waiting for the coprocessor
+
+        Otherwise the same as `autofocus_init_from_bitstream`."""
+        import asyncio
+
+        if not self._autofocus_firmware_needed(firmware, force, verify):
+            return False
+
+        # reset autofocus coprocessor
+        self.write_camera_register(_OV5640_REG_SYSTEM_RESET00, _OV5640_MCU_RESET)
+        await asyncio.sleep(0.01)
+
+        for offset in range(0, len(firmware), _I2C_BURST_SIZE):
+            self._write_autofocus_firmware_chunk(firmware, offset)
+            await asyncio.sleep(0)
+
+        self.write_camera_sequence(self._finalize_firmware_load)
+        for _ in range(100):
+            if self.autofocus_status == _OV5640_STAT_IDLE:
+                break
+            await asyncio.sleep(0.01)
         else:
-            binfile = "ov5640_autofocus.bin"
+            raise RuntimeError("Timed out after trying to load autofocus firmware")
+        return True
+
+    def _check_autofocus_supported(self):
+        if self.camera.sensor_name != "OV5640":
+            raise RuntimeError(f"Autofocus not supported on {self.camera.sensor_name}")
+
+    def _autofocus_firmware_needed(self, firmware, force, verify):
+        self._check_autofocus_supported()
+        if not force and self.autofocus_firmware_running:
+            if not verify or self._autofocus_firmware_matches(firmware):
+                return False
+        return True
+
+    def _write_autofocus_firmware_chunk(self, firmware, offset):
+        buf = self._burst_buf
+        num_firmware_bytes = min(_I2C_BURST_SIZE, len(firmware) - offset)
+        reg = offset + _OV5640_FIRMWARE_ADDR
+        buf[0] = reg >> 8
+        buf[1] = reg & 0xFF
+        buf[2 : 2 + num_firmware_bytes] = firmware[offset : offset + num_firmware_bytes]
+        with self._camera_device as i2c:
+            i2c.write(buf, end=2 + num_firmware_bytes)
+
+    def autofocus_init(self, force=False, verify=False):
+        """Initialize the autofocus engine from ov5640_autofocus.bin
+
+        See `autofocus_init_from_bitstream` for the meaning of ``force`` and
+        ``verify``."""
+        binfile = self._autofocus_firmware_filename()
         print(binfile)
-        return self.autofocus_init_from_file(binfile)
+        return self.autofocus_init_from_file(binfile, force=force, verify=verify)
+
+    @staticmethod
+    def _autofocus_firmware_filename():
+        if "/" in __file__:
+            return __file__.rsplit("/", 1)[0].rsplit(".", 1)[0] + "/ov5640_autofocus.bin"
+        return "ov5640_autofocus.bin"
+
+    async def autofocus_init_async(self, force=False, verify=False):
+        """Initialize the autofocus engine from ov5640_autofocus.bin without
+        blocking other asyncio tasks
+
+        See `autofocus_init_from_bitstream` for the meaning of ``force`` and
+        ``verify``."""
+        self._check_autofocus_supported()
+        if not (force or verify) and self.autofocus_firmware_running:
+            return False
+        binfile = self._autofocus_firmware_filename()
+        with open(binfile, mode="rb") as file:
+            firmware = file.read()
+        return await self.autofocus_init_from_bitstream_async(firmware, force=force, verify=verify)
 
     @property
     def autofocus_status(self):
         """Read the camera autofocus status register"""
-        return self.read_camera_register(_OV5640_CMD_FW_STATUS)
+        status = self.read_camera_register(_OV5640_CMD_FW_STATUS)
+        self._autofocus_status_value = status
+        self._autofocus_status_time = time.monotonic()
+        return status
+
+    @property
+    def autofocus_focused(self) -> bool:
+        """True if the autofocus engine reports that focus is locked
+
+        To keep this cheap enough to check every frame, the status register is
+        re-read only when the last reading is older than
+        `autofocus_status_max_age` seconds."""
+        if (
+            self._autofocus_status_time is None
+            or time.monotonic() - self._autofocus_status_time >= self.autofocus_status_max_age
+        ):
+            return self.autofocus_status == _OV5640_STAT_FOCUSED
+        return self._autofocus_status_value == _OV5640_STAT_FOCUSED
+
+    @property
+    def autofocus_continuous(self) -> bool:
+        """True if continuous autofocus was started with `autofocus_continuous_start`"""
+        return self._autofocus_continuous
+
+    def autofocus_continuous_start(self) -> bool:
+        """Let the autofocus engine track focus by itself while the camera runs
+
+        Returns True if the command was acknowledged."""
+        self._autofocus_status_time = None
+        self._autofocus_continuous = self._send_autofocus_command(
+            _OV5640_CMD_AUTO_AUTOFOCUS, "continuous autofocus"
+        )
+        return self._autofocus_continuous
+
+    def autofocus_continuous_stop(self) -> bool:
+        """Stop continuous autofocus, releasing the focus lock
+
+        Returns True if the command was acknowledged."""
+        self._autofocus_status_time = None
+        self._autofocus_continuous = False
+        return self._send_autofocus_command(_OV5640_CMD_RELEASE_FOCUS, "release focus")
+
+    def autofocus_if_needed(self) -> bool:
+        """Make sure the lens is focused before a shot
+
+        In continuous autofocus mode this returns as soon as focus is locked,
+        waiting at most `autofocus_lock_timeout` seconds. Otherwise, or if focus
+        does not lock in time, a full `autofocus` operation is performed, after
+        which continuous autofocus is restarted if it was active.
+        Returns True if the image is believed to be in focus."""
+        continuous = self._autofocus_continuous
+        if continuous:
+            deadline = time.monotonic() + self.autofocus_lock_timeout
+            while True:
+                if self.autofocus_focused:
+                    return True
+                if time.monotonic() >= deadline:
+                    break
+                time.sleep(0.01)
+        focused = any(self.autofocus())
+        if continuous:
+            self.autofocus_continuous_start()
+        return focused
 
     def _send_autofocus_command(self, command, msg):
         self.write_camera_register(_OV5640_CMD_ACK, 0x01)  # clear command ack
@@ -493,18 +1204,48 @@ See Learn Guide."""
             time.sleep(0.01)
         return False
 
+    async def _send_autofocus_command_async(self, command, msg):
+        import asyncio
+
+        self.write_camera_register(_OV5640_CMD_ACK, 0x01)  # clear command ack
+        self.write_camera_register(_OV5640_CMD_MAIN, command)  # send command
+        for _ in range(100):
+            if self.read_camera_register(_OV5640_CMD_ACK) == 0x0:  # command is finished
+                return True
+            await asyncio.sleep(0.01)
+        return False
+
     def autofocus(self) -> list[int]:
         """Perform an autofocus operation.
 
         If all elements of the list are 0, the autofocus operation failed. Otherwise,
         if at least one element is nonzero, the operation succeeded.
 
-        In principle the elements correspond to 5 autofocus regions, if configured."""
+        In principle the elements correspond to 5 autofocus regions, if configured.
+
+        This ends continuous autofocus mode, if it was active."""
+        self._autofocus_continuous = False
+        self._autofocus_status_time = None
         if not self._send_autofocus_command(_OV5640_CMD_RELEASE_FOCUS, "release focus"):
             return [False] * 5
         if not self._send_autofocus_command(_OV5640_CMD_TRIGGER_AUTOFOCUS, "autofocus"):
             return [False] * 5
-        zone_focus = [self.read_camera_register(_OV5640_CMD_PARA0 + i) for i in range(5)]
+        zone_focus = list(self.read_camera_registers(_OV5640_CMD_PARA0, 5))
+        print(f"zones focused: {zone_focus}")
+        return zone_focus
+
+    async def autofocus_async(self) -> list[int]:
+        """Perform an autofocus operation, yielding to other asyncio tasks
+        while the lens moves.
+
+        The result has the same meaning as for `autofocus`."""
+        self._autofocus_continuous = False
+        self._autofocus_status_time = None
+        if not await self._send_autofocus_command_async(_OV5640_CMD_RELEASE_FOCUS, "release focus"):
+            return [False] * 5
+        if not await self._send_autofocus_command_async(_OV5640_CMD_TRIGGER_AUTOFOCUS, "autofocus"):
+            return [False] * 5
+        zone_focus = list(self.read_camera_registers(_OV5640_CMD_PARA0, 5))
         print(f"zones focused: {zone_focus}")
         return zone_focus
 
@@ -524,46 +1265,220 @@ See Learn Guide."""
         self.write_camera_register(_OV5640_CMD_PARA4, step)
         self._send_autofocus_command(_OV5640_CMD_AF_SET_VCM_STEP, "set vcm step")
 
+    async def get_autofocus_vcm_step_async(self):
+        """Get the voice coil motor step location without blocking other asyncio tasks"""
+        if not await self._send_autofocus_command_async(
+            _OV5640_CMD_AF_GET_VCM_STEP, "get vcm step"
+        ):
+            return None
+        return self.read_camera_register(_OV5640_CMD_PARA4)
+
+    async def set_autofocus_vcm_step_async(self, step):
+        """Set the voice coil motor step location, from 0 to 255, without
+        blocking other asyncio tasks"""
+        if not 0 <= step <= 255:
+            raise RuntimeError("VCM step must be 0 to 255")
+        self.write_camera_register(_OV5640_CMD_PARA3, 0x00)
+        self.write_camera_register(_OV5640_CMD_PARA4, step)
+        await self._send_autofocus_command_async(_OV5640_CMD_AF_SET_VCM_STEP, "set vcm step")
+
+    def contrast_autofocus(
+        self,
+        coarse_step=32,
+        fine_step=4,
+        region=None,
+        subsample=2,
+        settle_frames=1,
+        patience=2,
+        capture_retries=2,
+    ):
+        """Focus by driving the voice coil motor directly and maximizing image sharpness
+
+        Instead of the sensor's autofocus firmware, this sweeps
+        `autofocus_vcm_step` in steps of ``coarse_step``, stopping once
+        ``patience`` positions in a row score lower than the best so far, and
+        then refines around the best position, halving the step each time
+        down to ``fine_step``.
+
+        Sharpness is the gradient energy of the green channel inside
+        ``region``, an ``(x, y, width, height)`` tuple in preview pixels that
+        defaults to the middle half of the frame, sampling every
+        ``subsample``-th pixel in each direction. After each lens move,
+        ``settle_frames`` frames are discarded before one is scored. If no
+        frame arrives after ``capture_retries`` further attempts, that position
+        is skipped. Whatever happens, the lens is left at the best position
+        found so far.
+
+        The camera must be in live preview mode (RGB565 or grayscale). Continuous autofocus
+        is stopped if it was active.
+
+        Returns a dict with the chosen ``"step"``, its ``"score"``, and the
+        number of ``"frames"`` captured and ``"time"`` in seconds spent."""
+        start_time = time.monotonic()
+        if self._autofocus_continuous:
+            self.autofocus_continuous_stop()
+        if region is None:
+            width = self.camera.width
+            height = self.camera.height
+            region = (width // 4, height // 4, width // 2, height // 2)
+
+        scores = {}
+        frames = 0
+
+        def measure(step):
+            nonlocal frames
+            if step not in scores:
+                self.autofocus_vcm_step = step
+                for _ in range(settle_frames):
+                    self.continuous_capture()
+                frames += settle_frames
+                for _ in range(1 + capture_retries):
+                    frame = self.continuous_capture()
+                    frames += 1
+                    if frame is not None:
+                        break
+                if frame is None:
+                    scores[step] = -1  # frame timeout; never chosen
+                else:
+                    scores[step] = self._focus_score(
+                        frame,
+                        region,
+                        subsample,
+                        self._camera_pixel_format == espcamera.PixelFormat.GRAYSCALE,
+                    )
+            return scores[step]
+
+        best_step = 0
+        best_score = -1
+        try:
+            misses = 0
+            for step in range(0, 256, coarse_step):
+                score = measure(step)
+                if score > best_score:
+                    best_step, best_score, misses = step, score, 0
+                else:
+                    misses += 1
+                    if misses >= patience:
+                        break
+
+            step_size = coarse_step // 2
+            while step_size >= fine_step:
+                for step in (best_step - step_size, best_step + step_size):
+                    if 0 <= step <= 255 and measure(step) > best_score:
+                        best_step, best_score = step, scores[step]
+                step_size //= 2
+        finally:
+            self.autofocus_vcm_step = best_step
+        return {
+            "step": best_step,
+            "score": best_score,
+            "frames": frames,
+            "time": time.monotonic() - start_time,
+        }
+
+    @staticmethod
+    def _focus_score(bitmap, region, subsample, grayscale=False):
+        import ulab.numpy as np
+
+        x, y, width, height = region
+        pixels = np.frombuffer(bitmap, dtype=np.uint8 if grayscale else np.uint16)
+        pixels = pixels.reshape((bitmap.height, len(pixels) // bitmap.height))
+        window = pixels[y : y + height : subsample, x : x + width : subsample]
+        if grayscale:
+            green = np.array(window, dtype=np.float)
+        else:
+            # 6-bit green channel of byte-swapped RGB565
+            green = np.array(((window & 0x07) << 3) | (window >> 13), dtype=np.float)
+        horizontal = np.diff(green, axis=1)
+        vertical = np.diff(green, axis=0)
+        return np.sum(horizontal * horizontal) + np.sum(vertical * vertical)
+
+    def _focus_preset_slot(self, preset):
+        if isinstance(preset, str):
+            if preset not in self.focus_preset_names:
+                raise RuntimeError("Invalid focus preset")
+            preset = self.focus_preset_names.index(preset)
+        if not 0 <= preset < _FOCUS_PRESET_COUNT:
+            raise RuntimeError(f"Focus preset must be 0 to {_FOCUS_PRESET_COUNT - 1}")
+        return _NVM_FOCUS_PRESETS + 2 * preset
+
+    def focus_preset(self, preset):
+        """Get the VCM step stored in a focus preset, or None if it is empty
+
+        ``preset`` is a slot number from 0 to 7, or a name from `focus_preset_names`."""
+        slot = self._focus_preset_slot(preset)
+        if microcontroller.nvm[slot] != _FOCUS_PRESET_VALID:
+            return None
+        return microcontroller.nvm[slot + 1]
+
+    def save_focus_preset(self, preset, step=None):
+        """Remember a lens position in non-volatile memory
+
+        By default the current `autofocus_vcm_step` is stored, so call this
+        right after a successful `autofocus` or `contrast_autofocus`."""
+        slot = self._focus_preset_slot(preset)
+        if step is None:
+            step = self.autofocus_vcm_step
+            if step is None:
+                raise RuntimeError("Could not read VCM step")
+        microcontroller.nvm[slot : slot + 2] = bytes((_FOCUS_PRESET_VALID, step))
+        return step
+
+    def clear_focus_preset(self, preset):
+        """Forget a stored focus preset"""
+        slot = self._focus_preset_slot(preset)
+        microcontroller.nvm[slot] = 0
+
+    def recall_focus_preset(self, preset):
+        """Move the lens straight to a stored focus preset, without a focus sweep
+
+        Continuous autofocus is stopped if it was active. Returns the VCM step."""
+        step = self.focus_preset(preset)
+        if step is None:
+            raise RuntimeError("Focus preset is empty")
+        if self._autofocus_continuous:
+            self.autofocus_continuous_stop()
+        self.autofocus_vcm_step = step
+        return step
+
     def select_setting(self, setting_name):
         """For the point & shoot camera mode, control what setting is being set"""
-        self._effect_label.color = 0xFFFFFF
-        self._effect_label.background_color = 0x0
-        self._res_label.color = 0xFFFFFF
-        self._res_label.background_color = 0x0
         if self.mode_text in {"GIF", "GBOY"}:
-            self._res_label.text = ""
+            res_text = ""
         else:
-            self._res_label.text = self.resolutions[self._resolution]
-        self._mode_label.color = 0xFFFFFF
-        self._mode_label.background_color = 0x0
-        self.timelapse_rate_label.color = 0xFFFFFF
-        self.timelapse_rate_label.background_color = None
-
-        if setting_name == "effect":
-            self._effect_label.color = 0x0
-            self._effect_label.background_color = 0xFFFFFF
-        elif setting_name == "resolution":
-            self._res_label.color = 0x0
-            self._res_label.background_color = 0xFFFFFF
-        elif setting_name == "mode":
-            self._mode_label.color = 0x0
-            self._mode_label.background_color = 0xFFFFFF
-        elif setting_name == "led_level":
-            self._res_label.text = "LED LV"
-            self._res_label.color = 0x0
-            self._res_label.background_color = 0xFFFFFF
-        elif setting_name == "led_color":
-            self._res_label.text = "LED CLR"
-            self._res_label.color = 0x0
-            self._res_label.background_color = 0xFFFFFF
+            res_text = self.resolutions[self._resolution]
+        if setting_name == "led_level":
+            res_text = "LED LV"
         elif setting_name == "led_color":
-            self._res_label.text = "LED CLR"
-            self._res_label.color = 0x0
-            self._res_label.background_color = 0xFFFFFF
-        elif setting_name == "timelapse_rate":
-            self.timelapse_rate_label.color = 0x0
-            self.timelapse_rate_label.background_color = 0xFFFFFF
-        self.display.refresh()
+            res_text = "LED CLR"
+        highlight_res = setting_name in {"resolution", "led_level", "led_color"}
+
+        self._update_label(
+            "top",
+            self._res_label,
+            text=res_text,
+            color=0x0 if highlight_res else 0xFFFFFF,
+            background_color=0xFFFFFF if highlight_res else 0x0,
+        )
+        self._update_label(
+            "bottom",
+            self._effect_label,
+            color=0x0 if setting_name == "effect" else 0xFFFFFF,
+            background_color=0xFFFFFF if setting_name == "effect" else 0x0,
+        )
+        self._update_label(
+            "bottom",
+            self._mode_label,
+            color=0x0 if setting_name == "mode" else 0xFFFFFF,
+            background_color=0xFFFFFF if setting_name == "mode" else 0x0,
+        )
+        self._update_label(
+            "timelapse",
+            self.timelapse_rate_label,
+            color=0x0 if setting_name == "timelapse_rate" else 0xFFFFFF,
+            background_color=0xFFFFFF if setting_name == "timelapse_rate" else None,
+        )
+        self.refresh_status_bars()
 
     @property
     def mode(self):
@@ -579,15 +1494,15 @@ See Learn Guide."""
     def mode(self, setting):
         setting = (setting + len(self.modes)) % len(self.modes)
         self._mode = setting
-        self._mode_label.text = self.modes[setting]
-        if self.modes[setting] == "STOP":
-            self.stop_motion_frame = 0
-        if self.modes[setting] in {"GIF", "GBOY"}:
-            self._res_label.text = ""
-        else:
-            self.resolution = self.resolution  # kick it to reset the display
+        with self.batch_updates():
+            self._update_label("bottom", self._mode_label, text=self.modes[setting])
+            if self.modes[setting] == "STOP":
+                self.stop_motion_frame = 0
+            if self.modes[setting] in {"GIF", "GBOY"}:
+                self._update_label("top", self._res_label, text="")
+            else:
+                self.resolution = self.resolution  # kick it to reset the display
         microcontroller.nvm[_NVM_MODE] = setting
-        self.display.refresh()
 
     @property
     def effect(self):
@@ -598,10 +1513,11 @@ See Learn Guide."""
     def effect(self, setting):
         setting = (setting + len(self.effects)) % len(self.effects)
         self._effect = setting
-        self._effect_label.text = self.effects[setting]
+        self._update_label("bottom", self._effect_label, text=self.effects[setting])
         self.camera.special_effect = setting
+        self.invalidate_register_cache()
         microcontroller.nvm[_NVM_EFFECT] = setting
-        self.display.refresh()
+        self.refresh_status_bars()
 
     @property
     def resolution(self):
@@ -620,10 +1536,10 @@ See Learn Guide."""
             res = (res + len(self.resolutions)) % len(self.resolutions)
             microcontroller.nvm[_NVM_RESOLUTION] = res
             self._resolution = res
-            self._res_label.text = self.resolutions[res]
+            self._update_label("top", self._res_label, text=self.resolutions[res])
             _width = int(self.resolutions[self.resolution].split("x")[0])
             self.preview_scale = 240 / _width
-        self.display.refresh()
+        self.refresh_status_bars()
 
     @property
     def timelapse_rate(self):
@@ -635,11 +1551,12 @@ See Learn Guide."""
         setting = (setting + len(self.timelapse_rates)) % len(self.timelapse_rates)
         self._timelapse_rate = setting
         if self.timelapse_rates[setting] < 60:
-            self.timelapse_rate_label.text = f"{self.timelapse_rates[setting]:d} S"
+            rate_text = f"{self.timelapse_rates[setting]:d} S"
         else:
-            self.timelapse_rate_label.text = f"{self.timelapse_rates[setting] / 60:d} M"
+            rate_text = f"{self.timelapse_rates[setting] / 60:d} M"
+        self._update_label("timelapse", self.timelapse_rate_label, text=rate_text)
         microcontroller.nvm[_NVM_TIMELAPSE_RATE] = setting
-        self.display.refresh()
+        self.refresh_status_bars()
 
     @property
     def timelapse_submode(self):
@@ -650,7 +1567,11 @@ See Learn Guide."""
     def timelapse_submode(self, setting):
         setting = (setting + len(self.timelapse_submodes)) % len(self.timelapse_submodes)
         self._timelapse_submode = setting
-        self.timelapse_submode_label.text = self.timelapse_submodes[self._timelapse_submode]
+        self._update_label(
+            "timelapse",
+            self.timelapse_submode_label,
+            text=self.timelapse_submodes[self._timelapse_submode],
+        )
         microcontroller.nvm[_NVM_TIMELAPSE_SUBMODE] = setting
 
     def init_display(self):
@@ -675,7 +1596,11 @@ See Learn Guide."""
             backlight_pin=board.TFT_BACKLIGHT,
         )
         self.display.root_group = self.splash
-        self.display.refresh()
+        if self._batch_depth or self.deferred_refresh:
+            self.mark_status_bar_dirty(*self.status_bars)
+        else:
+            self._dirty_status_bars.clear()
+            self.display.refresh()
 
     def deinit_display(self):
         """Release the TFT display"""
@@ -684,26 +1609,51 @@ See Learn Guide."""
         self._display_bus = None
         self.display = None
 
-    def display_message(self, message, color=0xFF0000, scale=3, full_screen=False):
-        """Display a message on the TFT"""
-        text_area = label.Label(terminalio.FONT, text=message, color=color, scale=scale)
-        text_area.anchor_point = (0, 0) if full_screen else (0.5, 0.5)
+    def display_message(self, message, color=0xFF0000, scale=3, full_screen=False, refresh=True):
+        """Display a message on the TFT
+
+        A single label is created on first use and updated in place after that,
+        and displayio only redraws the area the text covers.
+
+        By default the message is drawn immediately and then removed from the
+        display tree, so the next refresh erases it. With ``refresh=False``
+        nothing is drawn now: the message appears at the next display refresh
+        and stays until `clear_message` is called."""
         if not self.display:
             self.init_display()
+        text_area = self._message_label
+        if text_area is None:
+            text_area = self._message_label = label.Label(terminalio.FONT)
+            self.splash.append(text_area)
+        elif self.splash[len(self.splash) - 1] is not text_area:
+            # keep the message on top of anything added since
+            self.splash.remove(text_area)
+            self.splash.append(text_area)
+        text_area.scale = scale
+        text_area.text = message
+        text_area.color = color
+        text_area.anchor_point = (0, 0) if full_screen else (0.5, 0.5)
         text_area.anchored_position = (
             (0, 0) if full_screen else (self.display.width / 2, self.display.height / 2)
         )
+        text_area.hidden = False
 
         # Show it
-        self.splash.append(text_area)
-        self.display.refresh()
-        self.splash.pop()
+        if refresh:
+            self.display.refresh()
+            text_area.hidden = True
+
+    def clear_message(self):
+        """Remove a message shown with ``display_message(..., refresh=False)``
+
+        The area is erased at the next display refresh."""
+        if self._message_label is not None:
+            self._message_label.hidden = True
 
     def mount_sd_card(self):
         """Attempt to mount the SD card"""
         if self._sd_label is not None:
-            self._sd_label.text = "NO SD"
-            self._sd_label.color = 0xFF0000
+            self._update_label("top", self._sd_label, text="NO SD", color=0xFF0000)
         if not self.card_detect.value:
             raise RuntimeError("No SD card inserted")
         if self.sdcard:
@@ -740,23 +1690,31 @@ See Learn Guide."""
             vfs = storage.VfsFat(self.sdcard)
             print("mount vfs @", time.monotonic() - self._timestamp)
             storage.mount(vfs, "/sd")
-            self._image_counter = 0
+            self._image_counter = None
+            self._image_index_dirty = False
+            self._sd_cluster_size = None
             if self._sd_label is not None:
-                self._sd_label.text = "SD OK"
-                self._sd_label.color = 0x00FF00
+                self._update_label("top", self._sd_label, text="SD OK", color=0x00FF00)
         finally:
             if had_display:
                 self.init_display()
 
     def unmount_sd_card(self):
-        """Unmount the SD card, if mounted"""
+        """Unmount the SD card, if mounted
+
+        Images still in the `queue_save` queue are written out first, if
+        possible, followed by the next image number."""
+        try:
+            self.flush_save_queue()
+        except OSError:
+            self._discard_save_queue()
+        self.save_image_index()
         try:
             storage.umount("/sd")
         except OSError:
             pass
         if self._sd_label is not None:
-            self._sd_label.text = "NO SD"
-            self._sd_label.color = 0xFF0000
+            self._update_label("top", self._sd_label, text="NO SD", color=0xFF0000)
 
     def keys_debounce(self):
         """Debounce all keys.
@@ -765,6 +1723,8 @@ See Learn Guide."""
 
         # shutter button is true GPIO so we debounce as normal
         self.shutter.update()
+        if self.shutter.fell:
+            self.shutter_fell_time = time.monotonic_ns()
         self.card_detect.update()
         self.up.update()
         self.down.update()
@@ -782,57 +1742,338 @@ See Learn Guide."""
             self.mute.value = False
 
     def live_preview_mode(self):
-        """Set the camera into live preview mode"""
-        self.camera.reconfigure(
-            pixel_format=espcamera.PixelFormat.RGB565,
-            frame_size=espcamera.FrameSize.HQVGA,
+        """Set the camera into live preview mode
+
+        The time this takes is recorded as the ``"restore_preview"`` phase of
+        the capture that preceded it."""
+        start_ns = time.monotonic_ns()
+        self.reconfigure_camera(
+            pixel_format=self._preview_pixel_format,
+            frame_size=self._preview_frame_size,
         )
+        if self._preview_dcw is not None and self.camera.dcw != self._preview_dcw:
+            self.camera.dcw = self._preview_dcw
+            self.invalidate_register_cache()
         # self.effect = self._effect
         self.continuous_capture_start()
+        if self._last_capture_stats is not None:
+            self._last_capture_stats.lap("restore_preview", start_ns)
+            self._last_capture_stats = None
 
     def open_next_image(self, extension="jpg", filename_prefix="img"):
-        """Return an opened numbered file on the sdcard, such as "img01234.jpg"."""
+        """Return an opened numbered file on the sdcard, such as "img01234.jpg".
+
+        The next number is read from a small index file on the card, so no
+        directory search is needed. The index is not written here, so that
+        opening and writing the image stays a single-file operation: the
+        library's own save functions call `save_image_index` once the image
+        file is closed. Code that uses this function directly should do the
+        same. If the index is missing or stale, the card is scanned once for
+        the highest number in use."""
+        filename = self._next_image_filename(extension, filename_prefix)
+        self._last_saved_image_filename = filename
+        print("Writing to", filename)
+        return open(filename, "wb")
+
+    def _next_image_filename(self, extension, filename_prefix):
         try:
             os.stat("/sd")
         except OSError as exc:  # no SD card!
             raise RuntimeError("No SD card mounted") from exc
-        while True:
-            filename = f"/sd/{filename_prefix}{self._image_counter:04d}.{extension}"
-            self._image_counter += 1
-            try:
-                os.stat(filename)
-            except OSError:
-                break
+        if self._image_counter is None:
+            self._image_counter = self._read_image_index()
+        filename = f"/sd/{filename_prefix}{self._image_counter:04d}.{extension}"
+        if self._file_exists(filename):
+            # index file is stale (or missing); find the highest number in use
+            self._image_counter = self._scan_image_counter(extension, filename_prefix)
+            while True:
+                filename = f"/sd/{filename_prefix}{self._image_counter:04d}.{extension}"
+                if not self._file_exists(filename):
+                    break
+                self._image_counter += 1
+        self._image_counter += 1
+        self._image_index_dirty = True
+        return filename
+
+    @staticmethod
+    def _file_exists(filename):
+        try:
+            os.stat(filename)
+        except OSError:
+            return False
+        return True
+
+    @staticmethod
+    def _read_image_index():
+        try:
+            with open(_IMAGE_INDEX_FILE) as file:
+                return int(file.read())
+        except (OSError, ValueError):
+            return 0
+
+    def save_image_index(self):
+        """Write the next image number to the index file on the SD card
+
+        This is done after each image saved by the library (once its file is
+        closed) and by `unmount_sd_card`. Nothing is written if no image was
+        numbered since the last call."""
+        if not self._image_index_dirty:
+            return
+        try:
+            with open(_IMAGE_INDEX_FILE, "w") as file:
+                file.write(str(self._image_counter))
+        except OSError:
+            pass  # read-only or removed card; the directory scan will still work
+        self._image_index_dirty = False
+
+    @staticmethod
+    def _scan_image_counter(extension, filename_prefix):
+        """One past the highest number used by a ``{filename_prefix}NNNN.{extension}`` file"""
+        suffix = "." + extension
+        highest = -1
+        for name in os.listdir("/sd"):
+            if not (name.startswith(filename_prefix) and name.endswith(suffix)):
+                continue
+            number = name[len(filename_prefix) : -len(suffix)]
+            if number and all(c in "0123456789" for c in number):
+                highest = max(highest, int(number))
+        return highest + 1
+
+    def queue_save(self, buffer, extension="jpg", filename_prefix="img"):
+        """Queue an image to be written to the next numbered file on the SD card
+
+        ``buffer`` is copied, so a camera frame buffer may be passed. The data
+        is written by later calls to `service_save_queue` (or by
+        `save_queue_task`), a piece at a time. If the queue already holds
+        `save_queue_budget` bytes, earlier images are written out first.
+
+        Returns the filename the image will be saved as."""
+        while self._save_queue and self._save_queue_bytes + len(buffer) > self.save_queue_budget:
+            self.service_save_queue()
+        filename = self._next_image_filename(extension, filename_prefix)
         self._last_saved_image_filename = filename
-        print("Writing to", filename)
-        return open(filename, "wb")
+        self._save_queue.append([bytes(buffer), filename, None, 0])
+        self._save_queue_bytes += len(buffer)
+        return filename
+
+    @property
+    def save_queue_pending(self) -> int:
+        """The number of bytes queued by `queue_save` that are not yet written"""
+        return self._save_queue_bytes
+
+    def service_save_queue(self) -> bool:
+        """Write the next piece of the oldest queued image to the SD card
+
+        Each piece is one FAT cluster, so this is short enough to call between
+        preview frames. Returns True if more data remains queued."""
+        if not self._save_queue:
+            return False
+        entry = self._save_queue[0]
+        data, filename, dest, offset = entry
+        if dest is None:
+            dest = entry[2] = open(filename, "wb")
+        end = min(offset + self._sd_cluster(), len(data))
+        dest.write(memoryview(data)[offset:end])
+        self._save_queue_bytes -= end - offset
+        entry[3] = end
+        if end == len(data):
+            dest.close()
+            self._save_queue.pop(0)
+            self.save_image_index()
+        return bool(self._save_queue)
+
+    def _sd_cluster(self):
+        if self._sd_cluster_size is None:
+            self._sd_cluster_size = os.statvfs("/sd")[0]
+        return self._sd_cluster_size
+
+    def _write_image(self, data, extension="jpg", filename_prefix="img", stats=None):
+        """Write ``data`` to the next numbered file without copying it
+
+        The ``"file_open"``, ``"write"`` and ``"close"`` phases are recorded in
+        ``stats``, if given. Returns a dict of save statistics, as described in
+        `capture_jpeg`."""
+        data = memoryview(data)
+        length = len(data)
+        chunksize = self.save_chunk_size
+        if chunksize:
+            cluster = self._sd_cluster()
+            chunksize = max(cluster, chunksize // cluster * cluster)
+        else:
+            chunksize = length
+        open_ns = time.monotonic_ns()
+        dest = self.open_next_image(extension=extension, filename_prefix=filename_prefix)
+        start_ns = time.monotonic_ns()
+        try:
+            for offset in range(0, length, chunksize):
+                dest.write(data[offset : offset + chunksize])
+        finally:
+            end_ns = time.monotonic_ns()
+            dest.close()
+        write_ms = (end_ns - start_ns) / 1_000_000
+        if stats is not None:
+            stats.record("file_open", start_ns - open_ns)
+            stats.record("write", end_ns - start_ns)
+            stats.lap("close", end_ns)
+        self.save_image_index()
+        return {
+            "filename": self._last_saved_image_filename,
+            "bytes": length,
+            "write_ms": write_ms,
+            "mb_per_s": length / write_ms / 1000 if write_ms else None,
+        }
 
-    def capture_jpeg(self, filename_prefix="img"):
-        """Capture a jpeg file and save it to the SD card"""
+    def flush_save_queue(self, filename=None):
+        """Write everything queued by `queue_save` to the SD card
+
+        If ``filename`` is given, only the images queued up to and including
+        that one are written."""
+        while self._save_queue:
+            if filename is not None and all(entry[1] != filename for entry in self._save_queue):
+                break
+            self.service_save_queue()
+
+    async def save_queue_task(self, idle_interval=0.05):
+        """An asyncio task that writes queued images between other tasks' work
+
+        While the queue is empty it checks again every ``idle_interval`` seconds."""
+        import asyncio
+
+        while True:
+            if self.service_save_queue():
+                await asyncio.sleep(0)
+            else:
+                await asyncio.sleep(idle_interval)
+
+    def _discard_save_queue(self):
+        for _, _, dest, _ in self._save_queue:
+            if dest is not None:
+                try:
+                    dest.close()
+                except OSError:
+                    pass
+        self._save_queue = []
+        self._save_queue_bytes = 0
+
+    def capture_jpeg(self, filename_prefix="img", focus=False, queued=False):
+        """Capture a jpeg file and save it to the SD card
+
+        If ``focus`` is True, `autofocus_if_needed` is called first, which costs
+        nothing when continuous autofocus already has focus locked.
+
+        If ``queued`` is True, the image is handed to `queue_save` instead of
+        being written before this returns.
+
+        The duration of each phase is recorded in ``capture_stats["capture_jpeg"]``.
+
+        The image is written straight from the camera's buffer in pieces of
+        `save_chunk_size` bytes. Returns a dict with the ``"filename"``, the
+        number of ``"bytes"``, the time spent writing in ``"write_ms"`` and the
+        resulting ``"mb_per_s"`` (both None for a queued image), or None if the
+        capture failed."""
         try:
             os.stat("/sd")
         except OSError as exc:  # no SD card!
             raise RuntimeError("No SD card mounted") from exc
 
-        self.camera.reconfigure(
-            pixel_format=espcamera.PixelFormat.JPEG,
-            frame_size=self.resolution_to_frame_size[self._resolution],
-        )
-        time.sleep(0.1)
+        stats = self.capture_stats["capture_jpeg"]
+        self._last_capture_stats = stats
+        t = time.monotonic_ns()
+        if focus:
+            self.autofocus_if_needed()
+            t = stats.lap("focus", t)
 
-        jpeg = self.camera.take(1)
+        jpeg = self._take_jpeg(stats, t)
         if jpeg is not None:
             print(f"Captured {len(jpeg)} bytes of jpeg data")
             print(f"Resolution {self.camera.width:d} x {self.camera.height:d}")
 
-            with self.open_next_image(filename_prefix=filename_prefix) as dest:
-                chunksize = 16384
-                for offset in range(0, len(jpeg), chunksize):
-                    dest.write(jpeg[offset : offset + chunksize])
-                    print(end=".")
-            print("# Wrote image")
-        else:
-            print("# frame capture failed")
+            if queued:
+                t = time.monotonic_ns()
+                result = {
+                    "filename": self.queue_save(jpeg, filename_prefix=filename_prefix),
+                    "bytes": len(jpeg),
+                    "write_ms": None,
+                    "mb_per_s": None,
+                }
+                stats.lap("queue", t)
+                return result
+            return self._write_image(jpeg, filename_prefix=filename_prefix, stats=stats)
+        print("# frame capture failed")
+        return None
+
+    def _take_jpeg(self, stats, start_ns):
+        """Switch to JPEG mode at the current resolution and take one image,
+        recording the ``"reconfigure"``, ``"settle"`` and ``"take"`` phases"""
+        changed = self.reconfigure_camera(
+            pixel_format=espcamera.PixelFormat.JPEG,
+            frame_size=self.resolution_to_frame_size[self._resolution],
+        )
+        t = stats.lap("reconfigure", start_ns)
+        if changed:
+            self._wait_for_frame()
+        t = stats.lap("settle", t)
+        jpeg = self.camera.take(1)
+        stats.lap("take", t)
+        return jpeg
+
+    def capture_burst(self, count, filename_prefix="img", memory_budget=None):
+        """Capture up to ``count`` jpeg images back to back, then save them to the SD card
+
+        Frames are copied into RAM (PSRAM on the PyCamera) as fast as the
+        camera delivers them, and only written out once the burst is over.
+        The burst ends early if the next frame would take the buffered data
+        over ``memory_budget`` bytes, which defaults to half the free memory.
+
+        Returns a dict with the number of ``"frames"`` captured, the average
+        ``"interval"`` between them in seconds, the ``"high_water"`` mark of
+        buffered bytes, and the list of ``"filenames"`` written."""
+        try:
+            os.stat("/sd")
+        except OSError as exc:  # no SD card!
+            raise RuntimeError("No SD card mounted") from exc
+
+        gc.collect()
+        if memory_budget is None:
+            memory_budget = gc.mem_free() // 2
+
+        if self.reconfigure_camera(
+            pixel_format=espcamera.PixelFormat.JPEG,
+            frame_size=self.resolution_to_frame_size[self._resolution],
+        ):
+            self._wait_for_frame()
+
+        frames = []
+        buffered = 0
+        first_time = last_time = None
+        for _ in range(count):
+            jpeg = self.camera.take(1)
+            if jpeg is None:
+                continue
+            if buffered + len(jpeg) > memory_budget:
+                break
+            frames.append(bytes(jpeg))
+            buffered += len(jpeg)
+            last_time = time.monotonic()
+            if first_time is None:
+                first_time = last_time
+        print(f"Captured {len(frames)} frames, {buffered} bytes of jpeg data")
+
+        filenames = []
+        while frames:
+            filenames.append(
+                self._write_image(frames.pop(0), filename_prefix=filename_prefix)["filename"]
+            )
+        print("# Wrote burst")
+
+        return {
+            "frames": len(filenames),
+            "interval": (last_time - first_time) / (len(filenames) - 1)
+            if len(filenames) > 1
+            else 0,
+            "high_water": buffered,
+            "filenames": filenames,
+        }
 
     @property
     def overlay(self) -> str:
@@ -877,18 +2118,27 @@ See Learn Guide."""
         Create a modified version of the last photo taken that pastes
         the overlay image on top of the photo and saves the new version
         in a separate but similarly named .bmp file on the SDCard.
+
+        The duration of each phase is recorded in
+        ``capture_stats["blit_overlay_into_last_capture"]``.
         """
         if self.overlay_bmp is None:
             raise ValueError("Must set overlay before calling blit_overlay_into_last_capture")
         from adafruit_bitmapsaver import save_pixels
         from displayio import Bitmap, ColorConverter, Colorspace
 
+        stats = self.capture_stats["blit_overlay_into_last_capture"]
+        t = time.monotonic_ns()
         self._init_jpeg_decoder()
+        # the last capture may still be waiting in the queue_save queue
+        self.flush_save_queue(self._last_saved_image_filename)
 
         width, height = self.decoder.open(self._last_saved_image_filename)
         photo_bitmap = Bitmap(width, height, 65535)
+        t = stats.lap("file_open", t)
 
         self.decoder.decode(photo_bitmap, scale=0, x=0, y=0)
+        t = stats.lap("decode", t)
 
         bitmaptools.rotozoom(
             photo_bitmap,
@@ -900,6 +2150,7 @@ See Learn Guide."""
             skip_index=self.overlay_transparency_color,
             scale=self.overlay_scale,
         )
+        t = stats.lap("composite", t)
 
         cc565_swapped = ColorConverter(input_colorspace=Colorspace.RGB565_SWAPPED)
         save_pixels(
@@ -907,6 +2158,7 @@ See Learn Guide."""
             photo_bitmap,
             cc565_swapped,
         )
+        stats.lap("write", t)
 
         # RAM cleanup
         photo_bitmap.deinit()
@@ -928,15 +2180,14 @@ See Learn Guide."""
     def capture_into_jpeg(self):
         """Captures an image and returns it in JPEG format.
 
+        The duration of each phase is recorded in ``capture_stats["capture_into_jpeg"]``.
+
         Returns:
             bytes: The captured image in JPEG format, otherwise None if the capture failed.
         """
-        self.camera.reconfigure(
-            pixel_format=espcamera.PixelFormat.JPEG,
-            frame_size=self.resolution_to_frame_size[self._resolution],
-        )
-        time.sleep(0.1)
-        jpeg = self.camera.take(1)
+        stats = self.capture_stats["capture_into_jpeg"]
+        self._last_capture_stats = stats
+        jpeg = self._take_jpeg(stats, time.monotonic_ns())
         if jpeg is not None:
             print(f"Captured {len(jpeg)} bytes of jpeg data")
             print(f"Resolution {self.camera.width:d} x {self.camera.height:d}")
@@ -952,8 +2203,158 @@ See Learn Guide."""
         """Capture an image into an internal buffer.
 
         The image is valid at least until the next image capture,
-        or the camera's capture mode is changed"""
-        return self.camera.take(1)
+        or the camera's capture mode is changed.
+
+        If `start_frame_history` is active, the image is also recorded there."""
+        frame = self.camera.take(1)
+        if self._history_slots is not None and frame is not None:
+            self._record_history_frame(frame)
+        return frame
+
+    def run_preview(self, callback=None, fps=None, duration=None):
+        """Run a live preview loop until ``callback`` returns False or
+        ``duration`` seconds have passed
+
+        Each pass debounces the keys and calls ``callback(self)``, and whenever
+        the camera has a new frame ready it is shown with `blit`. Waiting for a
+        frame never blocks, so key handling keeps running while the camera
+        fills its second frame buffer during the display transfer.
+
+        With ``fps``, frames are shown at most that often; each frame period
+        that passes without a frame being shown counts as dropped.
+
+        Returns a dict with the number of ``"frames"`` shown, the achieved
+        ``"fps"`` and the number of ``"dropped"`` frames, which is also kept in
+        `preview_stats`."""
+        period_ns = int(1_000_000_000 / fps) if fps else 0
+        start_ns = next_ns = time.monotonic_ns()
+        end_ns = start_ns + int(duration * 1_000_000_000) if duration else None
+        frames = 0
+        dropped = 0
+        while True:
+            now_ns = time.monotonic_ns()
+            if end_ns is not None and now_ns >= end_ns:
+                break
+            if now_ns >= next_ns and self.camera.frame_available:
+                self.blit(self.continuous_capture())
+                frames += 1
+                if period_ns:
+                    late = (now_ns - next_ns) // period_ns
+                    dropped += late
+                    next_ns += (late + 1) * period_ns
+            self.keys_debounce()
+            if callback is not None and callback(self) is False:
+                break
+        elapsed = (time.monotonic_ns() - start_ns) / 1_000_000_000
+        self.preview_stats = {
+            "frames": frames,
+            "fps": frames / elapsed if elapsed else 0,
+            "dropped": dropped,
+        }
+        return self.preview_stats
+
+    def start_frame_history(
+        self,
+        depth,
+        pixel_format=espcamera.PixelFormat.RGB565,
+        frame_size=espcamera.FrameSize.HQVGA,
+        jpeg_slot_size=65536,
+    ):
+        """Keep the last ``depth`` frames from `continuous_capture` for zero shutter lag
+
+        The camera's live preview is switched to ``pixel_format`` and
+        ``frame_size``. All storage is allocated up front: bitmaps of the
+        frame size for RGB565 and grayscale, or ``jpeg_slot_size`` byte
+        buffers for JPEG, so that recording a frame only copies it."""
+        self._preview_pixel_format = pixel_format
+        self._preview_frame_size = frame_size
+        self.live_preview_mode()
+        self._history_slots = None
+        gc.collect()
+        if pixel_format == espcamera.PixelFormat.JPEG:
+            slots = [bytearray(jpeg_slot_size) for _ in range(depth)]
+        else:
+            colors = 256 if pixel_format == espcamera.PixelFormat.GRAYSCALE else 65535
+            slots = [
+                displayio.Bitmap(self.camera.width, self.camera.height, colors)
+                for _ in range(depth)
+            ]
+        self._history_lengths = [0] * depth
+        self._history_times = [0] * depth
+        self._history_next = 0
+        self._history_count = 0
+        self._history_slots = slots
+
+    def stop_frame_history(self):
+        """Stop recording frames and release the history storage
+
+        Live preview goes back to the current `preview_profile`."""
+        self._history_slots = None
+        self._history_lengths = None
+        self._history_times = None
+        self._apply_preview_profile()
+        gc.collect()
+        self.live_preview_mode()
+
+    def _record_history_frame(self, frame):
+        index = self._history_next
+        slot = self._history_slots[index]
+        if isinstance(slot, bytearray):
+            length = len(frame)
+            if length > len(slot):
+                return  # doesn't fit, keep the older frame
+            slot[:length] = frame
+            self._history_lengths[index] = length
+        else:
+            if frame.width != slot.width or frame.height != slot.height:
+                return
+            bitmaptools.blit(slot, frame, 0, 0)
+        self._history_times[index] = time.monotonic_ns()
+        self._history_next = (index + 1) % len(self._history_slots)
+        self._history_count = min(self._history_count + 1, len(self._history_slots))
+
+    def capture_from_history(self, offset=None, filename_prefix="img"):
+        """Save a recorded frame from `start_frame_history` to the SD card
+
+        ``offset`` counts back from the newest frame (0). By default, the frame
+        closest to the moment the shutter button was last pressed is saved,
+        or the newest frame if it hasn't been pressed.
+
+        Bitmap frames are saved as .bmp files, which requires the optional
+        ``adafruit_bitmapsaver`` library. Returns the filename."""
+        if not self._history_count:
+            raise RuntimeError("No frames in history")
+        depth = len(self._history_slots)
+        if offset is None:
+            offset = 0
+            if self.shutter_fell_time is not None:
+                best = None
+                for i in range(self._history_count):
+                    delta = abs(
+                        self._history_times[(self._history_next - 1 - i) % depth]
+                        - self.shutter_fell_time
+                    )
+                    if best is None or delta < best:
+                        best, offset = delta, i
+        if not 0 <= offset < self._history_count:
+            raise RuntimeError(f"History offset must be 0 to {self._history_count - 1}")
+        index = (self._history_next - 1 - offset) % depth
+        slot = self._history_slots[index]
+        if isinstance(slot, bytearray):
+            with self.open_next_image(filename_prefix=filename_prefix) as dest:
+                dest.write(memoryview(slot)[: self._history_lengths[index]])
+        else:
+            from adafruit_bitmapsaver import save_pixels
+            from displayio import ColorConverter, Colorspace
+
+            if self._preview_pixel_format == espcamera.PixelFormat.GRAYSCALE:
+                converter = ColorConverter(input_colorspace=Colorspace.L8)
+            else:
+                converter = ColorConverter(input_colorspace=Colorspace.RGB565_SWAPPED)
+            with self.open_next_image(extension="bmp", filename_prefix=filename_prefix) as dest:
+                save_pixels(dest, slot, converter)
+        self.save_image_index()
+        return self._last_saved_image_filename
 
     def blit(self, bitmap, x_offset=0, y_offset=32):
         """Display a bitmap direct to the LCD, bypassing displayio
@@ -965,35 +2366,113 @@ See Learn Guide."""
         The default preview capture is 240x176, leaving 32 pixel rows at the top and bottom
         for status information.
         """
+        self._send_bitmap(self._compose_overlay(bitmap), x_offset, y_offset)
+
+    def _send_bitmap(self, bitmap, x_offset, y_offset):
+        if self.deferred_refresh and not self._batch_depth:
+            self._flush_status_bars()
+        self._display_bus.send(
+            42, struct.pack(">hh", 80 + x_offset, 80 + x_offset + bitmap.width - 1)
+        )
+        self._display_bus.send(43, struct.pack(">hh", y_offset, y_offset + bitmap.height - 1))
+        self._display_bus.send(44, bitmap)
+
+    def _compose_overlay(self, bitmap):
+        """Return the bitmap to send: ``bitmap`` itself, or a copy with the overlay drawn on it"""
         from displayio import Bitmap
 
         if self.overlay_bmp is not None:
-            if self.combined_bmp is None:
+            if (
+                self.combined_bmp is None
+                or self.combined_bmp.width != bitmap.width
+                or self.combined_bmp.height != bitmap.height
+            ):
                 self.combined_bmp = Bitmap(bitmap.width, bitmap.height, 65535)
 
+            # The whole frame has to be copied: camera frame bitmaps are
+            # read-only (and may be a caller's bitmap that must stay clean),
+            # and the display is sent a single bitmap. This is a plain copy;
+            # only the overlay's bounding box goes through the slower
+            # transparency-aware blit below.
             bitmaptools.blit(self.combined_bmp, bitmap, 0, 0)
 
-            bitmaptools.rotozoom(
-                self.combined_bmp,
-                self.overlay_bmp,
-                scale=self.preview_scale * self.overlay_scale,
-                skip_index=self.overlay_transparency_color,
-                ox=int(self.overlay_position[0] * self.preview_scale)
-                if self.overlay_position[0] is not None
-                else None,
-                oy=int(self.overlay_position[1] * self.preview_scale)
-                if self.overlay_position[1] is not None
-                else None,
-                px=0 if self.overlay_position[0] is not None else None,
-                py=0 if self.overlay_position[1] is not None else None,
-            )
+            overlay, box = self._scaled_overlay(bitmap.width, bitmap.height)
+            if box is not None:
+                bitmaptools.blit(
+                    self.combined_bmp,
+                    overlay,
+                    box[0],
+                    box[1],
+                    x1=box[0],
+                    y1=box[1],
+                    x2=box[2],
+                    y2=box[3],
+                    skip_source_index=self.overlay_transparency_color,
+                )
             bitmap = self.combined_bmp
+        return bitmap
 
-        self._display_bus.send(
-            42, struct.pack(">hh", 80 + x_offset, 80 + x_offset + bitmap.width - 1)
+    def _scaled_overlay(self, width, height):
+        """Return the overlay rendered at preview scale into a ``width`` x ``height``
+        bitmap, and its bounding box as ``(x1, y1, x2, y2)`` (or None if it is
+        entirely off screen)
+
+        The rendering is cached until the overlay or its placement changes."""
+        from displayio import Bitmap
+
+        key = (
+            self.overlay_bmp,
+            self.overlay_scale,
+            self.overlay_position[0],
+            self.overlay_position[1],
+            self.overlay_transparency_color,
+            self.preview_scale,
+            width,
+            height,
+        )
+        if key == self._overlay_preview_key:
+            return self._overlay_preview_bmp, self._overlay_preview_box
+
+        cached = self._overlay_preview_bmp
+        if cached is None or cached.width != width or cached.height != height:
+            self._overlay_preview_bmp = None
+            cached = Bitmap(width, height, 65535)
+        transparent = self.overlay_transparency_color
+        cached.fill(transparent if transparent is not None else 0)
+
+        scale = self.preview_scale * self.overlay_scale
+        scaled_width = self.overlay_bmp.width * scale
+        scaled_height = self.overlay_bmp.height * scale
+        if self.overlay_position[0] is not None:
+            left = int(self.overlay_position[0] * self.preview_scale)
+        else:
+            left = int(width / 2 - scaled_width / 2)
+        if self.overlay_position[1] is not None:
+            top = int(self.overlay_position[1] * self.preview_scale)
+        else:
+            top = int(height / 2 - scaled_height / 2)
+
+        bitmaptools.rotozoom(
+            cached,
+            self.overlay_bmp,
+            scale=scale,
+            skip_index=self.overlay_transparency_color,
+            ox=left if self.overlay_position[0] is not None else None,
+            oy=top if self.overlay_position[1] is not None else None,
+            px=0 if self.overlay_position[0] is not None else None,
+            py=0 if self.overlay_position[1] is not None else None,
         )
-        self._display_bus.send(43, struct.pack(">hh", y_offset, y_offset + bitmap.height - 1))
-        self._display_bus.send(44, bitmap)
+
+        x1 = max(0, left)
+        y1 = max(0, top)
+        x2 = min(width, left + int(scaled_width + 0.5))
+        y2 = min(height, top + int(scaled_height + 0.5))
+        box = (x1, y1, x2, y2) if x1 < x2 and y1 < y2 else None
+
+        self._overlay_preview_bmp = cached
+        self._overlay_preview_box = box
+        self._overlay_preview_key = key
+        return cached, box
 
     @property
     def led_level(self):
@@ -1025,17 +2504,13 @@ See Learn Guide."""
 
     def get_camera_autosettings(self):
         """Collect all the settings related to exposure and white balance"""
-        exposure = (
-            (self.read_camera_register(0x3500) << 12)
-            + (self.read_camera_register(0x3501) << 4)
-            + (self.read_camera_register(0x3502) >> 4)
-        )
-        white_balance = [
-            self.read_camera_register(x) for x in (0x3400, 0x3401, 0x3402, 0x3403, 0x3404, 0x3405)
-        ]
+        white_balance = list(self.read_camera_registers(0x3400, 6))
+        # 0x3500~0x3502 hold the exposure, 0x350B the gain
+        aec_agc = self.read_camera_registers(0x3500, 12)
+        exposure = (aec_agc[0] << 12) + (aec_agc[1] << 4) + (aec_agc[2] >> 4)
 
         settings = {
-            "gain": self.read_camera_register(0x350B),
+            "gain": aec_agc[11],
             "exposure": exposure,
             "wb": white_balance,
         }
@@ -1052,17 +2527,17 @@ See Learn Guide."""
         if wb_register_values is None:
             # just set to auto balance
             self.camera.whitebal = True
+            self.invalidate_register_cache()
             return
 
         if len(wb_register_values) != 6:
             raise RuntimeError("Please pass in 0x3400~0x3405 inclusive!")
 
-        self.write_camera_register(0x3212, 0x03)
-        self.write_camera_register(0x3406, 0x01)
+        reg_list = [0x3212, 0x03, 0x3406, 0x01]
         for i, reg_val in enumerate(wb_register_values):
-            self.write_camera_register(0x3400 + i, reg_val)
-        self.write_camera_register(0x3212, 0x13)
-        self.write_camera_register(0x3212, 0xA3)
+            reg_list += (0x3400 + i, reg_val)
+        reg_list += (0x3212, 0x13, 0x3212, 0xA3)
+        self.write_camera_list(reg_list)
 
     def set_camera_exposure(self, new_exposure=None):
         """Set the camera's exposure values
@@ -1074,8 +2549,10 @@ See Learn Guide."""
         if new_exposure is None:
             # just set auto expose
             self.camera.exposure_ctrl = True
+            self.invalidate_register_cache()
             return
         self.camera.exposure_ctrl = False
+        self.invalidate_register_cache()
 
         self.write_camera_register(0x3500, (new_exposure >> 12) & 0xFF)
         self.write_camera_register(0x3501, (new_exposure >> 4) & 0xFF)
@@ -1091,12 +2568,28 @@ See Learn Guide."""
         if new_gain is None:
             # just set auto expose
             self.camera.gain_ctrl = True
+            self.invalidate_register_cache()
             return
 
         self.camera.gain_ctrl = False
+        self.invalidate_register_cache()
         self.write_camera_register(0x350B, new_gain)
 
 
+class _BatchUpdates:
+    def __init__(self, camera):
+        self._camera = camera
+
+    def __enter__(self):
+        self._camera._batch_depth += 1
+        return self._camera
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._camera._batch_depth -= 1
+        if not self._camera._batch_depth:
+            self._camera.refresh_status_bars()
+
+
 class PyCamera(PyCameraBase):
     """Wrapper class for the PyCamera hardware"""
 
@@ -0,0 +1,72 @@
+# SPDX-FileCopyrightText: 2024 Adafruit Industries
+#
+# SPDX-License-Identifier: MIT
+"""Rolling timing statistics for the phases of a capture
+
+`adafruit_pycamera.PyCameraBase.capture_stats` holds one `CaptureStats` per
+capture method, so that shutter latency can be broken down on real hardware.
+"""
+
+import time
+
+
+class CaptureStats:
+    """Durations of named phases, keeping the last ``window`` samples of each"""
+
+    def __init__(self, window=32):
+        self.window = window
+        self._samples = {}
+        self._next = {}
+        self.last = {}
+        """Map of phase name to its most recent duration, in milliseconds"""
+
+    def reset(self):
+        """Forget all samples"""
+        self._samples = {}
+        self._next = {}
+        self.last = {}
+
+    def record(self, phase, duration_ns):
+        """Add one sample for ``phase``"""
+        samples = self._samples.get(phase)
+        if samples is None:
+            samples = self._samples[phase] = []
+            self._next[phase] = 0
+        if len(samples) < self.window:
+            samples.append(duration_ns)
+        else:
+            samples[self._next[phase]] = duration_ns
+            self._next[phase] = (self._next[phase] + 1) % self.window
+        self.last[phase] = duration_ns / 1_000_000
+
+    def lap(self, phase, start_ns):
+        """Record the time since ``start_ns`` as ``phase`` and return the current time,
+        to be used as the start of the next phase"""
+        now = time.monotonic_ns()
+        self.record(phase, now - start_ns)
+        return now
+
+    def summary(self):
+        """Return a dict mapping each phase to a dict of its ``"count"`` and its
+        ``"min"``, ``"mean"``, ``"max"`` and ``"p95"`` durations in milliseconds"""
+        result = {}
+        for phase, samples in self._samples.items():
+            ordered = sorted(samples)
+            count = len(ordered)
+            result[phase] = {
+                "count": count,
+                "min": ordered[0] / 1_000_000,
+                "mean": sum(ordered) / count / 1_000_000,
+                "max": ordered[-1] / 1_000_000,
+                "p95": ordered[int(0.95 * (count - 1))] / 1_000_000,
+            }
+        return result
+
+    def print_summary(self):
+        """Print a table of `summary`, in milliseconds"""
+        print(f"{'phase':<16} {'n':>4} {'min':>8} {'mean':>8} {'max':>8} {'p95':>8}")
+        for phase, stats in self.summary().items():
+            print(
+                f"{phase:<16} {stats['count']:>4d} {stats['min']:>8.1f} {stats['mean']:>8.1f}"
+                f" {stats['max']:>8.1f} {stats['p95']:>8.1f}"
+            )
@@ -0,0 +1,130 @@
+# SPDX-FileCopyrightText: 2024 Adafruit Industries
+#
+# SPDX-License-Identifier: MIT
+"""Opt-in accounting of I2C traffic, for finding where loop time goes
+
+Normally this is used through `adafruit_pycamera.PyCameraBase.start_i2c_profiling`,
+which wraps the camera, I/O expander and accelerometer devices. When the
+profiler is not enabled, the original devices are used directly and there is
+no overhead at all.
+"""
+
+import time
+
+
+class I2CProfiler:
+    """Collect transaction count, byte count and time, grouped by caller
+
+    The caller is the outermost active `section`; traffic outside of any
+    section is recorded as ``"other"``."""
+
+    def __init__(self):
+        self.stats = {}
+        """Map of caller name to a list ``[transactions, bytes, microseconds]``"""
+        self._section = None
+
+    def reset(self):
+        """Forget all collected statistics"""
+        self.stats = {}
+
+    def section(self, name):
+        """Return a context manager that attributes traffic to ``name``"""
+        return _Section(self, name)
+
+    def wrap(self, name, function):
+        """Return a version of ``function`` whose traffic is attributed to ``name``"""
+
+        def wrapper(*args, **kwargs):
+            with _Section(self, name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    def record(self, num_bytes, start_ns):
+        """Account one transaction of ``num_bytes`` that started at ``start_ns``"""
+        elapsed_us = (time.monotonic_ns() - start_ns) // 1000
+        name = self._section or "other"
+        entry = self.stats.get(name)
+        if entry is None:
+            entry = self.stats[name] = [0, 0, 0]
+        entry[0] += 1
+        entry[1] += num_bytes
+        entry[2] += elapsed_us
+
+    def print_summary(self):
+        """Print a table of the collected statistics, busiest caller first"""
+        print(f"{'caller':<24} {'xfers':>7} {'bytes':>8} {'ms':>9}")
+        for name, (transactions, num_bytes, elapsed_us) in sorted(
+            self.stats.items(), key=lambda item: -item[1][2]
+        ):
+            print(f"{name:<24} {transactions:>7d} {num_bytes:>8d} {elapsed_us / 1000:>9.2f}")
+
+
+class _Section:
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+        self._outermost = False
+
+    def __enter__(self):
+        self._outermost = self._profiler._section is None
+        if self._outermost:
+            self._profiler._section = self._name
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._outermost:
+            self._profiler._section = None
+
+
+def _span(buffer, start, end):
+    return (len(buffer) if end is None else end) - start
+
+
+class ProfiledI2CDevice:
+    """Stand-in for an `adafruit_bus_device.i2c_device.I2CDevice` that
+    reports every transaction to an `I2CProfiler`"""
+
+    def __init__(self, device, profiler):
+        self.device = device
+        """The wrapped device"""
+        self._profiler = profiler
+        self._i2c = None
+
+    def __enter__(self):
+        self._i2c = self.device.__enter__()  # noqa: PLC2801
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._i2c = None
+        return self.device.__exit__(exc_type, exc_value, traceback)  # noqa: PLC2801
+
+    def write(self, buf, *, start=0, end=None):
+        """Write bytes, as `I2CDevice.write`"""
+        start_ns = time.monotonic_ns()
+        self._i2c.write(buf, start=start, end=end)
+        self._profiler.record(_span(buf, start, end), start_ns)
+
+    def readinto(self, buf, *, start=0, end=None):
+        """Read bytes, as `I2CDevice.readinto`"""
+        start_ns = time.monotonic_ns()
+        self._i2c.readinto(buf, start=start, end=end)
+        self._profiler.record(_span(buf, start, end), start_ns)
+
+    def write_then_readinto(
+        self, out_buffer, in_buffer, *, out_start=0, out_end=None, in_start=0, in_end=None
+    ):
+        """Write then read bytes, as `I2CDevice.write_then_readinto`"""
+        start_ns = time.monotonic_ns()
+        self._i2c.write_then_readinto(
+            out_buffer,
+            in_buffer,
+            out_start=out_start,
+            out_end=out_end,
+            in_start=in_start,
+            in_end=in_end,
+        )
+        self._profiler.record(
+            _span(out_buffer, out_start, out_end) + _span(in_buffer, in_start, in_end),
+            start_ns,
+        )
@@ -0,0 +1,57 @@
+# SPDX-FileCopyrightText: 2024 Adafruit Industries
+#
+# SPDX-License-Identifier: MIT
+"""Compact, pre-built camera register sequences
+
+A register list in the format accepted by
+`adafruit_pycamera.PyCameraBase.write_camera_list` (flat register/value
+pairs, with ``0xFFFF`` meaning "delay this many milliseconds") can be
+compiled into a `bytes` object made of records:
+
+* a 2-byte big-endian length ``N`` followed by ``N`` bytes that are sent
+  as-is in one I2C write (2-byte register address, then data for consecutive
+  registers), or
+* a length of 0 followed by a 2-byte big-endian delay in milliseconds.
+
+`adafruit_pycamera.PyCameraBase.write_camera_sequence` plays such a blob
+without allocating per entry. The same format can be written to a file, for
+instance on a desktop computer with `compile_register_list`, and loaded with
+`load_register_sequence`.
+
+This module does not depend on any CircuitPython-specific modules.
+"""
+
+_REG_DLY = 0xFFFF
+
+
+def compile_register_list(reg_list, max_burst=1024):
+    """Turn a flat register/value list into a register sequence blob
+
+    Runs of consecutive registers are merged into one I2C write of at most
+    ``max_burst`` data bytes."""
+    result = bytearray()
+    frame = None
+    next_register = None
+    for i in range(0, len(reg_list), 2):
+        register = reg_list[i]
+        value = reg_list[i + 1]
+        if register == _REG_DLY or register != next_register or len(frame) - 2 == max_burst:
+            if frame:
+                result += len(frame).to_bytes(2, "big") + frame
+                frame = None
+            if register == _REG_DLY:
+                result += b"\0\0" + value.to_bytes(2, "big")
+                next_register = None
+                continue
+            frame = bytearray(register.to_bytes(2, "big"))
+        frame.append(value)
+        next_register = register + 1
+    if frame:
+        result += len(frame).to_bytes(2, "big") + frame
+    return bytes(result)
+
+
+def load_register_sequence(filename):
+    """Read a compiled register sequence from a file"""
+    with open(filename, "rb") as file:
+        return file.read()
@@ -168,6 +168,7 @@ while True:
                 dither=True,
             ) as g:
                 g.add_frame(last_frame, 1)
+            pycam.save_image_index()
 
         if pycam.mode_text == "GIF":
             try:
@@ -203,6 +204,7 @@ while True:
             print(f"average framerate {i / (t1 - t00)}fps")
             print(f"best {max(ft)} worst {min(ft)} std. deviation {np.std(ft)}")
             f.close()
+            pycam.save_image_index()
             pycam.display.refresh()
 
         if pycam.mode_text == "JPEG":
@@ -15,7 +15,7 @@ from adafruit_httpserver.server import Server
 import adafruit_pycamera
 
 pycam = adafruit_pycamera.PyCamera()
-pycam.camera.reconfigure(
+pycam.reconfigure_camera(
     pixel_format=espcamera.PixelFormat.JPEG,
     frame_size=espcamera.FrameSize.SVGA,
 )
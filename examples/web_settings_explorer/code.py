@@ -67,7 +67,7 @@ def lcd(request: Request) -> Response:
 
 @server.route("/jpeg", [GET, POST])
 def take_jpeg(request: Request) -> Response:
-    pycam.camera.reconfigure(
+    pycam.reconfigure_camera(
         pixel_format=espcamera.PixelFormat.JPEG,
         frame_size=pycam.resolution_to_frame_size[pycam._resolution],
     )